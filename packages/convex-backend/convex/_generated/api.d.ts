@@ -11,6 +11,8 @@
 import type * as actions from "../actions.js";
 import type * as agent from "../agent.js";
 import type * as config from "../config.js";
+import type * as crons from "../crons.js";
+import type * as llmCache from "../llmCache.js";
 import type * as messages from "../messages.js";
 import type * as sessions from "../sessions.js";
 import type * as streamHandler from "../streamHandler.js";
@@ -25,6 +27,8 @@ declare const fullApi: ApiFromModules<{
   actions: typeof actions;
   agent: typeof agent;
   config: typeof config;
+  crons: typeof crons;
+  llmCache: typeof llmCache;
   messages: typeof messages;
   sessions: typeof sessions;
   streamHandler: typeof streamHandler;
@@ -1,23 +1,29 @@
 "use node";
 
-import { action } from "./_generated/server";
+import { createHash } from "crypto";
+import { action, ActionCtx } from "./_generated/server";
 import { v } from "convex/values";
-import { api } from "./_generated/api";
-import { StateGraph, START, END, Annotation } from "@langchain/langgraph";
+import { api, internal } from "./_generated/api";
+import { StateGraph, START, END, Annotation, LangGraphRunnableConfig } from "@langchain/langgraph";
 import { ChatOpenAI } from "@langchain/openai";
-import { HumanMessage, SystemMessage } from "@langchain/core/messages";
+import { BaseMessage, HumanMessage, SystemMessage } from "@langchain/core/messages";
 import {
   LLM_CONFIG,
+  CACHE_CONFIG,
+  RETENTION_CONFIG,
+  STREAM_CONFIG,
   TAVILY_CONFIG,
   PERSONA_DESCRIPTIONS,
   TREND_SOURCES_CONFIG,
+  REDDIT_SOURCES_CONFIG,
+  PLATFORM_ALIASES,
   DEFAULT_SCOPE,
   THRESHOLDS,
   SYSTEM_MESSAGES,
   PROMPTS,
   USER_MESSAGES,
-  getPersonaContext,
   getPersonaCopyContext,
+  stripCodeFence,
 } from "./config";
 
 // Polyfill for performance API (required by LangChain in Convex runtime)
@@ -56,7 +62,6 @@ const AgentStateAnnotation = Annotation.Root({
     url: string;
     published_date: string;
     source: string;
-    raw_data: any;
     score?: number;
     comments?: number;
     subreddit?: string;
@@ -100,41 +105,463 @@ const AgentStateAnnotation = Annotation.Root({
 // Type alias for convenience
 type AgentState = typeof AgentStateAnnotation.State;
 
+// Fast-mode LLM JSON, validated once into the shapes the state (and the
+// pendingApprovals validator) expect
+type FastResearchResult = {
+  researchReport: string;
+  sources: string[];
+  trendingTopics: AgentState["trendingTopics"];
+  enrichedTrends: AgentState["enrichedTrends"];
+  confidenceScores: AgentState["confidenceScores"];
+};
+
+const optionalString = (value: unknown): string | undefined =>
+  value === undefined || value === null ? undefined : String(value);
+
+function parseFastResearch(data: any, fallbackReport: string): FastResearchResult {
+  const isObject = data !== null && typeof data === "object";
+  return {
+    researchReport: isObject && typeof data.research_report === "string" && data.research_report
+      ? data.research_report
+      : fallbackReport,
+    sources: isObject && Array.isArray(data.sources)
+      ? data.sources.filter((source: unknown): source is string => typeof source === "string")
+      : [],
+    trendingTopics: isObject && Array.isArray(data.trending_topics)
+      ? data.trending_topics
+          .filter((t: any) => t && typeof t === "object" && t.topic)
+          .map((t: any) => ({
+            topic: String(t.topic),
+            reason: String(t.reason ?? ""),
+            url: optionalString(t.url),
+            timestamp: optionalString(t.timestamp),
+            confidence: optionalString(t.confidence),
+          }))
+      : [],
+    enrichedTrends: isObject && Array.isArray(data.enriched_trends) ? data.enriched_trends : [],
+    confidenceScores: isObject && data.confidence_scores && typeof data.confidence_scores === "object"
+      ? data.confidence_scores
+      : {},
+  };
+}
+
 // Pending approvals are now stored in the database via sessions.ts
 
+// Patterns used to pull structured data out of LLM responses
+const URL_PATTERN = /https?:\/\/[^\s\)]+/g;
+const IDEA_LINE_EDGE_PATTERN = /^["',\s]+|["',\s]+$/g;
+const IDEA_LINE_SKIP_PREFIXES = ["#", "```"];
+const IDEA_LINE_SKIP_EXACT = new Set(["[", "]", "{", "}"]);
+
+// Final check for ideas parsed from JSON: long enough and not a stray code fence
+function isUsableIdea(idea: string): boolean {
+  return idea.length > THRESHOLDS.minIdeaLength && !idea.startsWith("```");
+}
+
+// Fallback for non-JSON idea responses: one pass over the lines, stripping quote/comma
+// edges and dropping headings, fences and bare brackets
+function parseIdeaLines(text: string): string[] {
+  const ideas: string[] = [];
+  for (const rawLine of text.split("\n")) {
+    const line = rawLine.replace(IDEA_LINE_EDGE_PATTERN, "");
+    if (
+      line.length > THRESHOLDS.minIdeaLength &&
+      !IDEA_LINE_SKIP_EXACT.has(line) &&
+      !IDEA_LINE_SKIP_PREFIXES.some((prefix) => line.startsWith(prefix))
+    ) {
+      ideas.push(line);
+    }
+  }
+  return ideas;
+}
+
+// Find the first top-level balanced {...} in text that contains `mustContain`, in one
+// linear pass. Quotes are only tracked inside an object, so stray quotes in surrounding
+// markdown don't throw off the depth count
+function extractBalancedJsonObject(text: string, mustContain: string): string | null {
+  let depth = 0;
+  let start = -1;
+  let inString = false;
+  let escaped = false;
+
+  for (let i = 0; i < text.length; i++) {
+    const char = text[i];
+
+    if (inString) {
+      if (escaped) {
+        escaped = false;
+      } else if (char === "\\") {
+        escaped = true;
+      } else if (char === '"') {
+        inString = false;
+      }
+      continue;
+    }
+
+    if (char === '"' && depth > 0) {
+      inString = true;
+    } else if (char === "{") {
+      if (depth === 0) {
+        start = i;
+      }
+      depth++;
+    } else if (char === "}" && depth > 0) {
+      depth--;
+      if (depth === 0) {
+        const candidate = text.substring(start, i + 1);
+        if (candidate.includes(mustContain)) {
+          return candidate;
+        }
+      }
+    }
+  }
+
+  return null;
+}
+
+// Static system prompts are shared across calls instead of rebuilt per request
+const RESEARCH_PLANNING_SYSTEM_MESSAGE = new SystemMessage(SYSTEM_MESSAGES.researchPlanningAssistant);
+const TREND_ANALYSIS_SYSTEM_MESSAGE = new SystemMessage(SYSTEM_MESSAGES.trendAnalysisExpert);
+
+// Run an async mapper over items with at most `limit` calls in flight, preserving input order
+async function mapWithConcurrency<T, R>(
+  items: T[],
+  limit: number,
+  fn: (item: T, index: number) => Promise<R>
+): Promise<R[]> {
+  const results: R[] = new Array(items.length);
+  let nextIndex = 0;
+
+  const worker = async () => {
+    while (nextIndex < items.length) {
+      const index = nextIndex++;
+      results[index] = await fn(items[index], index);
+    }
+  };
+
+  const workerCount = Math.min(limit, items.length);
+  await Promise.all(Array.from({ length: workerCount }, worker));
+  return results;
+}
+
+// Key for ideas generated from a given research report, platform set and persona
+function ideasCacheKey(research: string, platforms: string[], persona?: string): string {
+  return createHash("sha256")
+    .update(JSON.stringify([research, [...platforms].sort(), persona || ""]))
+    .digest("hex");
+}
+
+// Events the UI waits on to change state; these are written as soon as they arrive
+const FLUSH_IMMEDIATELY_EVENT_TYPES = new Set(["approval_required", "complete"]);
+
+// Group events that arrive within `maxWaitMs` of the first buffered one (or up to
+// `maxItems`) so each batch costs one mutation. The pending next() carries over between
+// batches, so the agent keeps running while a batch is being written
+async function* batchStreamEvents<T extends { type?: string }>(
+  source: AsyncIterable<T>,
+  maxWaitMs: number,
+  maxItems: number
+): AsyncGenerator<T[], void, unknown> {
+  const iterator = source[Symbol.asyncIterator]();
+  let pending: Promise<IteratorResult<T>> | null = null;
+  let batch: T[] = [];
+  let deadline = 0;
+
+  try {
+    while (true) {
+      if (!pending) {
+        pending = iterator.next();
+      }
+
+      let result: IteratorResult<T> | null;
+      if (batch.length === 0) {
+        result = await pending;
+      } else {
+        let timer: ReturnType<typeof setTimeout> | undefined;
+        const timeout = new Promise<null>((resolve) => {
+          timer = setTimeout(() => resolve(null), Math.max(0, deadline - Date.now()));
+        });
+        result = await Promise.race([pending, timeout]);
+        clearTimeout(timer);
+        if (result === null) {
+          yield batch;
+          batch = [];
+          continue;
+        }
+      }
+
+      pending = null;
+      if (result.done) {
+        break;
+      }
+      if (batch.length === 0) {
+        deadline = Date.now() + maxWaitMs;
+      }
+      batch.push(result.value);
+      if (batch.length >= maxItems || FLUSH_IMMEDIATELY_EVENT_TYPES.has(result.value?.type ?? "")) {
+        yield batch;
+        batch = [];
+      }
+    }
+
+    if (batch.length > 0) {
+      yield batch;
+    }
+  } finally {
+    // If the consumer stopped early (e.g. a mutation threw), stop the agent stream too
+    // and swallow any rejection from the in-flight next() nobody will await
+    pending?.catch(() => {});
+    await iterator.return?.();
+  }
+}
+
+// In-process LRU layer in front of the llmCache table (Map preserves insertion order)
+const memoryResponseCache = new Map<string, { response: string; expiresAt: number }>();
+
+function getMemoryCachedResponse(key: string): string | null {
+  const entry = memoryResponseCache.get(key);
+  if (!entry) {
+    return null;
+  }
+  if (entry.expiresAt <= Date.now()) {
+    memoryResponseCache.delete(key);
+    return null;
+  }
+  // Re-insert to mark as most recently used
+  memoryResponseCache.delete(key);
+  memoryResponseCache.set(key, entry);
+  return entry.response;
+}
+
+function setMemoryCachedResponse(key: string, response: string, expiresAt: number): void {
+  memoryResponseCache.delete(key);
+  memoryResponseCache.set(key, { response, expiresAt });
+  while (memoryResponseCache.size > CACHE_CONFIG.maxMemoryEntries) {
+    const oldestKey = memoryResponseCache.keys().next().value;
+    if (oldestKey === undefined) break;
+    memoryResponseCache.delete(oldestKey);
+  }
+}
+
+// Deduplicate in a single pass, keeping first-seen order and skipping empty values
+function uniqueInOrder(values: Iterable<string | null | undefined>): string[] {
+  const seen = new Set<string>();
+  const unique: string[] = [];
+  for (const value of values) {
+    if (value && !seen.has(value)) {
+      seen.add(value);
+      unique.push(value);
+    }
+  }
+  return unique;
+}
+
+function normalizePlatformName(platform: string): string {
+  const platformLower = platform.toLowerCase().trim();
+  return PLATFORM_ALIASES[platformLower] || platformLower;
+}
+
+// Curated trend domains per platform selection, memoized since the config is static
+const MAX_DOMAIN_CACHE_ENTRIES = 256;
+const platformDomainsCache = new Map<string, string[]>();
+
+function getDomainsForPlatforms(platforms: string[]): string[] {
+  const cacheKey = platforms.join("\n");
+  const cached = platformDomainsCache.get(cacheKey);
+  if (cached) {
+    return cached;
+  }
+
+  const uniqueDomains = uniqueInOrder(
+    platforms.flatMap((platform) => TREND_SOURCES_CONFIG[normalizePlatformName(platform)] || [])
+  );
+
+  if (platformDomainsCache.size >= MAX_DOMAIN_CACHE_ENTRIES) {
+    platformDomainsCache.clear();
+  }
+  platformDomainsCache.set(cacheKey, uniqueDomains);
+  return uniqueDomains;
+}
+
+// Most relevant subreddits for a research domain, falling back to the general list
+function selectSubreddits(domain: unknown): string[] {
+  const key = String(domain ?? "").toLowerCase().trim();
+  const subreddits = Object.prototype.hasOwnProperty.call(REDDIT_SOURCES_CONFIG, key)
+    ? REDDIT_SOURCES_CONFIG[key]
+    : REDDIT_SOURCES_CONFIG.general;
+  return subreddits.slice(0, THRESHOLDS.maxSubredditsPerSearch);
+}
+
+// Normalize a URL for duplicate detection: lowercase host, no tracking params, fragment or trailing slash
+function normalizeUrl(url: string): string {
+  try {
+    const parsed = new URL(url.trim());
+    for (const param of Array.from(parsed.searchParams.keys())) {
+      if (param.toLowerCase().startsWith("utm_")) {
+        parsed.searchParams.delete(param);
+      }
+    }
+    parsed.hash = "";
+    parsed.pathname = parsed.pathname.replace(/\/+$/, "");
+    return parsed.toString().replace(/\/+$/, "");
+  } catch {
+    return url.trim().toLowerCase().replace(/\/+$/, "");
+  }
+}
+
+// Drop candidates whose URL was already seen (keeps first occurrence and candidates without a URL)
+function dedupeCandidatesByUrl(candidates: any[]): any[] {
+  const seenUrls = new Set<string>();
+  return candidates.filter((candidate) => {
+    if (!candidate.url) {
+      return true;
+    }
+    const normalizedUrl = normalizeUrl(candidate.url);
+    if (seenUrls.has(normalizedUrl)) {
+      return false;
+    }
+    seenUrls.add(normalizedUrl);
+    return true;
+  });
+}
+
+// Cache key for a candidate's enrichment, independent of which prompt produced it
+function candidateEnrichmentKey(candidate: { source?: string; url?: string; content?: string }): string {
+  return createHash("sha256")
+    .update(JSON.stringify([
+      "enrichment",
+      LLM_CONFIG.modelName,
+      candidate.source || "",
+      candidate.url || "",
+      candidate.content || "",
+    ]))
+    .digest("hex");
+}
+
+// One ChatOpenAI client per process, reused across actions so its HTTP connections
+// stay warm; rebuilt only if the API key changes
+let sharedLlm: { apiKey: string; llm: ChatOpenAI } | null = null;
+
+function getSharedLlm(apiKey: string): ChatOpenAI {
+  if (!sharedLlm || sharedLlm.apiKey !== apiKey) {
+    sharedLlm = {
+      apiKey,
+      llm: new ChatOpenAI({
+        modelName: LLM_CONFIG.modelName,
+        temperature: LLM_CONFIG.temperature,
+        openAIApiKey: apiKey,
+      }),
+    };
+  }
+  return sharedLlm.llm;
+}
+
 class MarketingCopyAgent {
   private llm: ChatOpenAI;
+  private ctx: ActionCtx | null;
   private tavilyApiKey: string | null;
   private composioApiKey: string | null;
   private composioUserId: string | null;
   private composioMcpUrl: string | null;
-  private deepModeGraph: any; // StateGraph instance for deep mode
-  private fastModeGraph: any; // StateGraph instance for fast mode
+  private cacheEnabled: boolean; // Set DISABLE_LLM_CACHE=true to always call the LLM
 
-  constructor() {
+  constructor(ctx?: ActionCtx) {
     const openaiApiKey = process.env.OPENAI_API_KEY;
     if (!openaiApiKey) {
       throw new Error("OPENAI_API_KEY environment variable is not set. Please set it using: npx convex env set OPENAI_API_KEY <your-key>");
     }
-    this.llm = new ChatOpenAI({
-      modelName: LLM_CONFIG.modelName,
-      temperature: LLM_CONFIG.temperature,
-      openAIApiKey: openaiApiKey,
-    });
+    this.llm = getSharedLlm(openaiApiKey);
+    this.ctx = ctx || null;
     this.tavilyApiKey = process.env.TAVILY_API_KEY || null;
     this.composioApiKey = process.env.COMPOSIO_API_KEY || null;
     this.composioUserId = process.env.COMPOSIO_USER_ID || null;
     this.composioMcpUrl = null;
-    this.deepModeGraph = null; // Will be initialized when needed
-    this.fastModeGraph = null; // Will be initialized when needed
+    this.cacheEnabled = process.env.DISABLE_LLM_CACHE !== "true";
   }
 
-  private normalizePlatformName(platform: string): string {
-    const platformLower = platform.toLowerCase().trim();
-    if (platformLower === "x" || platformLower === "twitter") {
-      return "x";
+
+  // Invoke the LLM through the response cache (memory first, then the llmCache table)
+  // jsonMode asks OpenAI to constrain the output to a single JSON object; bypassCache
+  // skips the lookup (restart/refine want a fresh answer) but still stores the result
+  private async cachedInvoke(
+    messages: BaseMessage[],
+    ttlMs: number,
+    options: { jsonMode?: boolean; bypassCache?: boolean } = {}
+  ): Promise<string> {
+    const jsonMode = options.jsonMode || false;
+    const key = createHash("sha256")
+      .update(JSON.stringify({
+        model: LLM_CONFIG.modelName,
+        messages: messages.map((m) => m.content),
+        temperature: LLM_CONFIG.temperature,
+        jsonMode,
+      }))
+      .digest("hex");
+
+    if (!options.bypassCache) {
+      const [cachedResponse] = await this.getCachedValues([key]);
+      if (cachedResponse !== null) {
+        return cachedResponse;
+      }
+    }
+
+    const response = await this.llm.invoke(
+      messages,
+      jsonMode ? { response_format: { type: "json_object" } } : undefined
+    );
+    const responseText = typeof response.content === 'string' ? response.content : String(response.content);
+
+    await this.setCachedValues([{ key, response: responseText }], ttlMs);
+    return responseText;
+  }
+
+  // Look up cache keys in memory, then fetch any misses from the llmCache table in one query
+  private async getCachedValues(keys: string[]): Promise<Array<string | null>> {
+    if (!this.cacheEnabled) {
+      return keys.map(() => null);
+    }
+
+    const values = keys.map((key) => getMemoryCachedResponse(key));
+    const missingIndexes = values.flatMap((value, index) => (value === null ? [index] : []));
+
+    if (this.ctx && missingIndexes.length > 0) {
+      try {
+        const storedValues = await this.ctx.runQuery(internal.llmCache.getCachedResponses, {
+          keys: missingIndexes.map((index) => keys[index]),
+        });
+        const now = Date.now();
+        storedValues.forEach((storedValue, i) => {
+          // Keep the row's own expiry so the memory copy can't outlive it
+          if (storedValue !== null && storedValue.expiresAt > now) {
+            values[missingIndexes[i]] = storedValue.response;
+            setMemoryCachedResponse(keys[missingIndexes[i]], storedValue.response, storedValue.expiresAt);
+          }
+        });
+      } catch (error) {
+        console.error("Error reading LLM cache:", error);
+      }
+    }
+
+    return values;
+  }
+
+  // Write cache entries to memory and to the llmCache table in one mutation
+  private async setCachedValues(entries: Array<{ key: string; response: string }>, ttlMs: number): Promise<void> {
+    if (!this.cacheEnabled) {
+      return;
+    }
+
+    for (const entry of entries) {
+      setMemoryCachedResponse(entry.key, entry.response, Date.now() + ttlMs);
+    }
+
+    if (this.ctx && entries.length > 0) {
+      try {
+        await this.ctx.runMutation(internal.llmCache.storeCachedResponses, { entries, ttlMs });
+      } catch (error) {
+        console.error("Error writing LLM cache:", error);
+      }
     }
-    return platformLower;
   }
 
   // Helper to add stream event to state
@@ -171,28 +598,24 @@ class MarketingCopyAgent {
       new HumanMessage(researchPrompt)
     ];
 
-    const response = await this.llm.invoke(messages);
-    const responseText = typeof response.content === 'string' ? response.content : String(response.content);
+    const responseText = await this.cachedInvoke(messages, CACHE_CONFIG.fastResearchTtlMs, {
+      bypassCache: state.isRefinement
+    });
 
     let researchReport = "";
     let sources: string[] = [];
-    let trendingTopics: any[] = [];
-    let enrichedTrends: any[] = [];
-    let confidenceScores: Record<string, any> = {};
+    let trendingTopics: AgentState["trendingTopics"] = [];
+    let enrichedTrends: AgentState["enrichedTrends"] = [];
+    let confidenceScores: AgentState["confidenceScores"] = {};
 
     try {
-      const jsonMatch = responseText.match(/\{.*"trending_topics".*\}/s);
-      if (jsonMatch) {
-        const parsedData = JSON.parse(jsonMatch[0]);
-        researchReport = parsedData.research_report || responseText;
-        sources = parsedData.sources || [];
-        trendingTopics = parsedData.trending_topics || [];
-        enrichedTrends = parsedData.enriched_trends || [];
-        confidenceScores = parsedData.confidence_scores || {};
+      const jsonText = extractBalancedJsonObject(responseText, '"trending_topics"');
+      if (jsonText) {
+        ({ researchReport, sources, trendingTopics, enrichedTrends, confidenceScores } =
+          parseFastResearch(JSON.parse(jsonText), responseText));
       } else {
         researchReport = responseText;
-        const urlPattern = /https?:\/\/[^\s\)]+/g;
-        sources = Array.from(new Set(responseText.match(urlPattern) || []));
+        sources = uniqueInOrder(responseText.match(URL_PATTERN) || []);
         trendingTopics = sources.slice(0, THRESHOLDS.fallbackTrendCount).map((url, i) => ({
           topic: `Trend ${i + 1}`,
           reason: "Relevant trend identified in research",
@@ -204,8 +627,7 @@ class MarketingCopyAgent {
     } catch (error) {
       console.error("Error parsing fast mode response:", error);
       researchReport = responseText;
-      const urlPattern = /https?:\/\/[^\s\)]+/g;
-      sources = Array.from(new Set(responseText.match(urlPattern) || []));
+      sources = uniqueInOrder(responseText.match(URL_PATTERN) || []);
       trendingTopics = sources.slice(0, 5).map((url, i) => ({
         topic: `Trend ${i + 1}`,
         reason: "Relevant trend from research",
@@ -289,29 +711,25 @@ class MarketingCopyAgent {
     const scopePrompt = PROMPTS.scopeAnalysis(query);
 
     const messages = [
-      new SystemMessage(SYSTEM_MESSAGES.researchPlanningAssistant),
+      RESEARCH_PLANNING_SYSTEM_MESSAGE,
       new HumanMessage(scopePrompt)
     ];
 
-    const response = await this.llm.invoke(messages);
-    const scopeText = typeof response.content === 'string' ? response.content : String(response.content);
+    const scopeText = await this.cachedInvoke(messages, CACHE_CONFIG.scopeTtlMs, { jsonMode: true });
     
-    // Parse scope from response
-    let scope: { time_window: string; region: string; domain: string } = { ...DEFAULT_SCOPE };
+    // Parse scope from response (JSON mode guarantees an object, not the field types),
+    // keeping each default unless the model returned a non-empty string for it
+    const scope: { time_window: string; region: string; domain: string } = { ...DEFAULT_SCOPE };
     try {
-      const jsonMatch = scopeText.match(/\{.*?\}/s);
-      if (jsonMatch) {
-        scope = JSON.parse(jsonMatch[0]);
+      const parsedScope = JSON.parse(scopeText);
+      for (const field of ["time_window", "region", "domain"] as const) {
+        const value = parsedScope?.[field];
+        if (typeof value === "string" && value.trim()) {
+          scope[field] = value.trim();
+        }
       }
     } catch (e) {
-      // Fallback parsing
-      if (scopeText.toLowerCase().includes("week") || scopeText.toLowerCase().includes("7 days")) {
-        scope.time_window = "last 7 days";
-      } else if (scopeText.toLowerCase().includes("month") || scopeText.toLowerCase().includes("30 days")) {
-        scope.time_window = "last 30 days";
-      } else if (scopeText.toLowerCase().includes("quarter") || scopeText.toLowerCase().includes("3 months")) {
-        scope.time_window = "last 3 months";
-      }
+      console.error("Error parsing research scope:", e);
     }
 
     // Decide which tools to use
@@ -357,21 +775,13 @@ class MarketingCopyAgent {
           content: `Recent developments in ${query} show significant growth and adoption.`,
           url: "https://example.com/trend1",
           published_date: new Date().toISOString(),
-          source: "tavily",
-          raw_data: {}
+          source: "tavily"
         }
       ];
     }
 
     // Collect domains from all platforms
-    const allDomains: string[] = [];
-    for (const platform of platforms) {
-      const normalizedPlatform = this.normalizePlatformName(platform);
-      const platformDomains = TREND_SOURCES_CONFIG[normalizedPlatform] || [];
-      allDomains.push(...platformDomains);
-    }
-
-    const uniqueDomains = Array.from(new Set(allDomains));
+    const uniqueDomains = getDomainsForPlatforms(platforms);
     const searchQuery = `${query} ${scope.domain || ""} trends ${scope.time_window || ""}`;
 
     try {
@@ -396,6 +806,7 @@ class MarketingCopyAgent {
           "Content-Type": "application/json",
         },
         body: JSON.stringify(searchParams),
+        signal: AbortSignal.timeout(TAVILY_CONFIG.timeoutMs),
       });
 
       if (!response.ok) {
@@ -408,8 +819,7 @@ class MarketingCopyAgent {
         content: result.content || "",
         url: result.url || "",
         published_date: result.published_date || new Date().toISOString(),
-        source: "tavily",
-        raw_data: result
+        source: "tavily"
       }));
     } catch (error) {
       console.error("Error fetching from Tavily:", error);
@@ -421,28 +831,135 @@ class MarketingCopyAgent {
     query: string,
     scope: { time_window: string; region: string; domain: string }
   ): Promise<any[]> {
+    const subreddits = selectSubreddits(scope.domain);
+
     if (!this.composioApiKey || !this.composioUserId) {
       // Simulated results
       return [
         {
           title: `Discussion: ${query} is gaining traction`,
           content: `Community discussion about ${query} shows increasing interest.`,
-          url: "https://reddit.com/r/technology/example",
+          url: `https://reddit.com/r/${subreddits[0]}/example`,
           published_date: new Date(Date.now() - 86400000).toISOString(),
           source: "reddit",
           score: 150,
           comments: 45,
-          subreddit: "technology",
-          raw_data: {}
+          subreddit: subreddits[0]
         }
       ];
     }
 
     // For now, simulate Reddit - Composio MCP integration would require more setup
-    // In production, you'd make HTTP calls to Composio's MCP endpoint
+    // In production, you'd make HTTP calls to Composio's MCP endpoint for each of
+    // `subreddits` concurrently, stopping once maxTrendsToEnrich candidates are collected
     return [];
   }
 
+  // Enrich a single trend candidate with an LLM-generated summary
+  private async enrichCandidate(candidate: any): Promise<any> {
+    const enrichmentPrompt = PROMPTS.trendEnrichment(candidate);
+
+    try {
+      const messages = [
+        TREND_ANALYSIS_SYSTEM_MESSAGE,
+        new HumanMessage(enrichmentPrompt)
+      ];
+
+      const enrichmentText = await this.cachedInvoke(messages, CACHE_CONFIG.enrichmentTtlMs, { jsonMode: true });
+      let enrichment: any = {};
+      
+      try {
+        enrichment = JSON.parse(enrichmentText);
+      } catch (e) {
+        enrichment = {
+          summary: enrichmentText.substring(0, THRESHOLDS.fallbackTextLength),
+          why_it_matters: "Relevant trend for target audience",
+          key_evidence: [candidate.url || ""]
+        };
+      }
+
+      return {
+        ...candidate,
+        summary: enrichment.summary || candidate.title || "",
+        why_it_matters: enrichment.why_it_matters || "Relevant trend",
+        key_evidence: enrichment.key_evidence || [candidate.url || ""]
+      };
+    } catch (error) {
+      console.error("Error enriching trend:", error);
+      return {
+        ...candidate,
+        summary: candidate.title || "",
+        why_it_matters: "Relevant trend for marketing",
+        key_evidence: [candidate.url || ""]
+      };
+    }
+  }
+
+  // Enrich candidates, skipping any whose enrichment is already cached by (source, url, content).
+  // The rest go out in one batched LLM call; any candidate the batch response misses
+  // falls back to its own (concurrent) enrichment call
+  private async enrichCandidates(candidates: any[]): Promise<any[]> {
+    if (candidates.length === 0) {
+      return [];
+    }
+
+    const enrichments = new Map<number, any>();
+    const candidateKeys = candidates.map((candidate) => candidateEnrichmentKey(candidate));
+    const cachedEnrichments = await this.getCachedValues(candidateKeys);
+    cachedEnrichments.forEach((cachedEnrichment, index) => {
+      if (cachedEnrichment !== null) {
+        try {
+          enrichments.set(index, JSON.parse(cachedEnrichment));
+        } catch (e) {
+          // Ignore unreadable entries; the candidate is re-enriched below
+        }
+      }
+    });
+
+    const uncachedIndexes = candidates.flatMap((_, index) => (enrichments.has(index) ? [] : [index]));
+    if (uncachedIndexes.length > 0) {
+      const uncachedCandidates = uncachedIndexes.map((index) => candidates[index]);
+      try {
+        const messages = [
+          TREND_ANALYSIS_SYSTEM_MESSAGE,
+          new HumanMessage(PROMPTS.batchTrendEnrichment(uncachedCandidates))
+        ];
+
+        const batchText = await this.cachedInvoke(messages, CACHE_CONFIG.enrichmentTtlMs, { jsonMode: true });
+        const parsed = JSON.parse(batchText);
+        const newEntries: Array<{ key: string; response: string }> = [];
+        for (const enrichment of Array.isArray(parsed.enrichments) ? parsed.enrichments : []) {
+          const batchIndex = Number(enrichment?.i);
+          if (Number.isInteger(batchIndex) && batchIndex >= 0 && batchIndex < uncachedIndexes.length && enrichment.summary) {
+            const candidateIndex = uncachedIndexes[batchIndex];
+            const { summary, why_it_matters, key_evidence } = enrichment;
+            enrichments.set(candidateIndex, { summary, why_it_matters, key_evidence });
+            newEntries.push({
+              key: candidateKeys[candidateIndex],
+              response: JSON.stringify({ summary, why_it_matters, key_evidence }),
+            });
+          }
+        }
+        await this.setCachedValues(newEntries, CACHE_CONFIG.candidateEnrichmentTtlMs);
+      } catch (error) {
+        console.error("Error in batched trend enrichment, falling back to per-trend calls:", error);
+      }
+    }
+
+    return mapWithConcurrency(candidates, LLM_CONFIG.maxConcurrentCalls, async (candidate, index) => {
+      const enrichment = enrichments.get(index);
+      if (!enrichment) {
+        return this.enrichCandidate(candidate);
+      }
+      return {
+        ...candidate,
+        summary: enrichment.summary || candidate.title || "",
+        why_it_matters: enrichment.why_it_matters || "Relevant trend",
+        key_evidence: enrichment.key_evidence || [candidate.url || ""]
+      };
+    });
+  }
+
   // LangGraph Node: Trend Retrieval
   private trendRetrievalNode = async (state: AgentState): Promise<Partial<AgentState>> => {
     const query = state.query;
@@ -460,19 +977,12 @@ class MarketingCopyAgent {
       message: USER_MESSAGES.trendRetrieval
     });
 
-    const trendCandidates: any[] = [];
-
-    // Fetch from Tavily
-    if (toolsToUse.includes("tavily")) {
-      const tavilyResults = await this.fetchFromTavily(query, scope, platforms);
-      trendCandidates.push(...tavilyResults);
-    }
-
-    // Fetch from Reddit
-    if (toolsToUse.includes("reddit")) {
-      const redditResults = await this.fetchFromReddit(query, scope);
-      trendCandidates.push(...redditResults);
-    }
+    // Fetch from Tavily and Reddit concurrently (both helpers swallow their own errors)
+    const [tavilyResults, redditResults] = await Promise.all([
+      toolsToUse.includes("tavily") ? this.fetchFromTavily(query, scope, platforms) : Promise.resolve([]),
+      toolsToUse.includes("reddit") ? this.fetchFromReddit(query, scope) : Promise.resolve([]),
+    ]);
+    const trendCandidates = dedupeCandidatesByUrl([...tavilyResults, ...redditResults]);
 
     // Emit trend candidate events
     for (const candidate of trendCandidates) {
@@ -487,49 +997,9 @@ class MarketingCopyAgent {
     }
 
     // Enrich trends with LLM
-    const enrichedTrends: any[] = [];
-    for (const candidate of trendCandidates.slice(0, THRESHOLDS.maxTrendsToEnrich)) {
-      const enrichmentPrompt = PROMPTS.trendEnrichment(candidate);
-
-      try {
-        const messages = [
-          new SystemMessage(SYSTEM_MESSAGES.trendAnalysisExpert),
-          new HumanMessage(enrichmentPrompt)
-        ];
-
-        const response = await this.llm.invoke(messages);
-        const enrichmentText = typeof response.content === 'string' ? response.content : String(response.content);
-        let enrichment: any = {};
-        
-        try {
-          const jsonMatch = enrichmentText.match(/\{.*?\}/s);
-          if (jsonMatch) {
-            enrichment = JSON.parse(jsonMatch[0]);
-          }
-        } catch (e) {
-          enrichment = {
-            summary: enrichmentText.substring(0, THRESHOLDS.fallbackTextLength),
-            why_it_matters: "Relevant trend for target audience",
-            key_evidence: [candidate.url || ""]
-          };
-        }
-
-        enrichedTrends.push({
-          ...candidate,
-          summary: enrichment.summary || candidate.title || "",
-          why_it_matters: enrichment.why_it_matters || "Relevant trend",
-          key_evidence: enrichment.key_evidence || [candidate.url || ""]
-        });
-      } catch (error) {
-        console.error("Error enriching trend:", error);
-        enrichedTrends.push({
-          ...candidate,
-          summary: candidate.title || "",
-          why_it_matters: "Relevant trend for marketing",
-          key_evidence: [candidate.url || ""]
-        });
-      }
-    }
+    const enrichedTrends = await this.enrichCandidates(
+      trendCandidates.slice(0, THRESHOLDS.maxTrendsToEnrich)
+    );
 
     events.push({
       type: "trend_retrieval_complete",
@@ -547,7 +1017,10 @@ class MarketingCopyAgent {
   };
 
   // LangGraph Node: Research Report
-  private researchReportNode = async (state: AgentState): Promise<Partial<AgentState>> => {
+  private researchReportNode = async (
+    state: AgentState,
+    config?: LangGraphRunnableConfig
+  ): Promise<Partial<AgentState>> => {
     const enrichedTrends = state.enrichedTrends || [];
     const query = state.query;
     const scope = state.scope || {};
@@ -555,12 +1028,18 @@ class MarketingCopyAgent {
     // Collect all events
     const events: any[] = [];
 
-    // Emit step event
-    events.push({
+    // Emit step event - through the writer when streaming, so it reaches the UI
+    // before the partial drafts it introduces
+    const stepEvent = {
       type: "step",
       step: "research_report",
       message: USER_MESSAGES.researchReport
-    });
+    };
+    if (config?.writer) {
+      config.writer(stepEvent);
+    } else {
+      events.push(stepEvent);
+    }
 
     const topTrends = enrichedTrends.slice(0, THRESHOLDS.maxTrendsForReport);
 
@@ -601,9 +1080,7 @@ class MarketingCopyAgent {
       };
     }
 
-    // Get persona context
     const persona = state.persona;
-    const personaContext = getPersonaContext(persona);
 
     // Generate formatted report
     const reportPrompt = PROMPTS.researchReport(
@@ -623,11 +1100,22 @@ class MarketingCopyAgent {
       new HumanMessage(reportPrompt)
     ];
 
-    const response = await this.llm.invoke(messages);
-    const researchReport = typeof response.content === 'string' ? response.content : String(response.content);
+    // Stream the report so drafts reach the UI while the model is still generating
+    let researchReport = "";
+    let lastFlushedLength = 0;
+    for await (const chunk of await this.llm.stream(messages)) {
+      researchReport += typeof chunk.content === 'string' ? chunk.content : String(chunk.content);
+      if (config?.writer && researchReport.length - lastFlushedLength >= THRESHOLDS.reportStreamFlushChars) {
+        config.writer({
+          type: "research_report_partial",
+          research_report: researchReport
+        });
+        lastFlushedLength = researchReport.length;
+      }
+    }
 
     // Extract sources
-    const sources = Array.from(new Set(topTrends.map((t: any) => t.url).filter(Boolean)));
+    const sources = uniqueInOrder(topTrends.map((t: any) => t.url));
 
     // Format trending topics
     const trendingTopics = topTrends.map((t: any, i: number) => ({
@@ -671,70 +1159,135 @@ class MarketingCopyAgent {
     };
   };
 
+  // Generate copy ideas for several platforms in one JSON-mode call, so the research is
+  // sent once. Returns only the platforms that came back with usable ideas
+  private async generateBatchedIdeas(
+    research: string,
+    platforms: string[],
+    persona?: "author" | "founder",
+    bypassCache: boolean = false
+  ): Promise<Record<string, string[]>> {
+    const batchedIdeas: Record<string, string[]> = {};
+    try {
+      const messages = [
+        new SystemMessage(SYSTEM_MESSAGES.multiPlatformCopyExpert(
+          persona,
+          persona ? PERSONA_DESCRIPTIONS[persona] : undefined
+        )),
+        new HumanMessage(PROMPTS.multiPlatformCopyGeneration(research, platforms, persona))
+      ];
+
+      const responseText = await this.cachedInvoke(messages, CACHE_CONFIG.ideasTtlMs, { jsonMode: true, bypassCache });
+      const parsed = JSON.parse(responseText);
+
+      // Match reply keys case- and whitespace-insensitively ("Linkedin" for "LinkedIn")
+      const ideasByPlatform = new Map<string, unknown>();
+      if (parsed && typeof parsed === "object") {
+        for (const [key, value] of Object.entries(parsed)) {
+          ideasByPlatform.set(key.toLowerCase().trim(), value);
+        }
+      }
+
+      for (const platform of platforms) {
+        const rawIdeas = ideasByPlatform.get(platform.toLowerCase().trim());
+        const platformIdeas = Array.isArray(rawIdeas)
+          ? rawIdeas
+              .map((idea: any) => String(idea).trim())
+              .filter(isUsableIdea)
+              .slice(0, THRESHOLDS.maxIdeasPerPlatform)
+          : [];
+        if (platformIdeas.length > 0) {
+          batchedIdeas[platform] = platformIdeas;
+        }
+      }
+    } catch (error) {
+      console.error("Error in batched idea generation, falling back to per-platform calls:", error);
+    }
+    return batchedIdeas;
+  }
+
+  // Generate copy ideas for a single platform
+  private async generatePlatformIdeas(
+    research: string,
+    platform: string,
+    persona?: "author" | "founder",
+    bypassCache: boolean = false
+  ): Promise<string[]> {
+    const platformPrompt = PROMPTS.platformCopyGenerationSimple(research, platform, persona);
+
+    const systemMessage = SYSTEM_MESSAGES.marketingCopyExpertSimple(
+      platform,
+      persona,
+      persona ? PERSONA_DESCRIPTIONS[persona] : undefined
+    );
+
+    const messages = [
+      new SystemMessage(systemMessage),
+      new HumanMessage(platformPrompt)
+    ];
+
+    const ideasText = await this.cachedInvoke(messages, CACHE_CONFIG.ideasTtlMs, { bypassCache });
+    
+    let ideasList: string[] = [];
+    try {
+      const parsed = JSON.parse(stripCodeFence(ideasText));
+      if (Array.isArray(parsed)) {
+        ideasList = parsed.map((idea: any) => String(idea).trim()).filter(isUsableIdea);
+      }
+    } catch (error) {
+      ideasList = parseIdeaLines(ideasText);
+    }
+
+    return ideasList.slice(0, THRESHOLDS.maxIdeasPerPlatform);
+  }
+
   // LangGraph Node: Generate Ideas
-  private generateIdeasNode = async (state: AgentState): Promise<Partial<AgentState>> => {
+  private generateIdeasNode = async (
+    state: AgentState,
+    config?: LangGraphRunnableConfig
+  ): Promise<Partial<AgentState>> => {
     const platforms = state.platforms;
     const research = state.researchReport || state.research || "";
-    const query = state.query;
     const persona = state.persona;
+    // Ideas for research that came from a restart/refine are always generated fresh
+    const bypassCache = state.isRefinement;
 
     // Collect all events
     const events: any[] = [];
 
-    const ideas: Record<string, string[]> = {};
-
-    for (const platform of platforms) {
-      const platformPrompt = PROMPTS.platformCopyGenerationSimple(research, platform, persona);
-
-      const systemMessage = SYSTEM_MESSAGES.marketingCopyExpertSimple(
-        platform,
-        persona,
-        persona ? PERSONA_DESCRIPTIONS[persona] : undefined
-      );
-
-      const messages = [
-        new SystemMessage(systemMessage),
-        new HumanMessage(platformPrompt)
-      ];
-
-      const response = await this.llm.invoke(messages);
-      const ideasText = typeof response.content === 'string' ? response.content : String(response.content);
-      
-      let ideasList: string[] = [];
-      try {
-        const cleanedText = ideasText
-          .replace(/^```json\s*/i, "")
-          .replace(/^```\s*/, "")
-          .replace(/\s*```$/, "")
-          .trim();
-        
-        const parsed = JSON.parse(cleanedText);
-        if (Array.isArray(parsed)) {
-          ideasList = parsed.map((idea: any) => String(idea).trim()).filter((idea: string) => idea.length > THRESHOLDS.minIdeaLength);
-        }
-      } catch (error) {
-        ideasList = ideasText
-          .split("\n")
-          .map((line: string) => line.trim())
-          .filter((line: string) => line && !line.startsWith("#") && !line.startsWith("```") && !["[", "]", "{", "}"].includes(line))
-          .map((line: string) => line.trim())
-          .filter((line: string) => line.length > THRESHOLDS.minIdeaLength);
+    // Generate ideas for all platforms in one batched call; platforms the batch
+    // misses fall back to their own (concurrent) calls. With a stream writer, each
+    // platform's ideas go out as soon as they're ready instead of after the slowest one
+    const batchedIdeas = platforms.length > 1
+      ? await this.generateBatchedIdeas(research, platforms, persona, bypassCache)
+      : {};
+    const platformIdeas = await mapWithConcurrency(
+      platforms,
+      LLM_CONFIG.maxConcurrentCalls,
+      async (platform) => {
+        const ideasForPlatform = batchedIdeas[platform] || await this.generatePlatformIdeas(research, platform, persona, bypassCache);
+        config?.writer?.({
+          type: "idea_stream",
+          platform,
+          ideas: ideasForPlatform
+        });
+        return ideasForPlatform;
       }
+    );
 
-      ideas[platform] = ideasList.slice(0, THRESHOLDS.maxIdeasPerPlatform).filter((idea: string) => 
-        idea && idea.length > THRESHOLDS.minIdeaLength && 
-        !idea.startsWith("```") && 
-        idea !== "```json" && 
-        idea !== "```"
-      );
-
-      // Emit idea stream event
-      events.push({
-        type: "idea_stream",
-        platform,
-        ideas: ideas[platform]
-      });
-    }
+    const ideas: Record<string, string[]> = {};
+    platforms.forEach((platform, index) => {
+      ideas[platform] = platformIdeas[index];
+
+      // Without a writer, emit idea stream events with the final state instead
+      if (!config?.writer) {
+        events.push({
+          type: "idea_stream",
+          platform,
+          ideas: ideas[platform]
+        });
+      }
+    });
 
     events.push({
       type: "complete",
@@ -750,20 +1303,39 @@ class MarketingCopyAgent {
   };
 
   // Conditional edge function: Check if approval is needed
-  private checkApproval = (state: AgentState): string => {
+  private static checkApproval(state: AgentState): string {
     if (state.needsApproval && !state.approved) {
       return "end"; // Exit graph, wait for external approval
     }
     return "generate_ideas"; // Continue to idea generation
-  };
+  }
+
+  // Compiled graphs are shared by every agent in the process (agents are built per action,
+  // so per-instance graphs were recompiled on every run). Nodes look up the running agent
+  // from config.configurable.agent, which each stream() call passes in
+  private static deepModeGraph: any = null; // StateGraph instance for deep mode
+  private static fastModeGraph: any = null; // StateGraph instance for fast mode
+  private static ideaGraph: any = null; // StateGraph instance for post-approval idea generation
+
+  private static agentFrom(config?: LangGraphRunnableConfig): MarketingCopyAgent {
+    const agent = config?.configurable?.agent;
+    if (!(agent instanceof MarketingCopyAgent)) {
+      throw new Error("Graph run is missing its agent in config.configurable");
+    }
+    return agent;
+  }
 
   // Build Deep Mode Graph
-  private buildDeepModeGraph(): any {
+  private static buildDeepModeGraph(): any {
     const graph = new StateGraph(AgentStateAnnotation)
-      .addNode("research_plan", this.researchPlanNode)
-      .addNode("trend_retrieval", this.trendRetrievalNode)
-      .addNode("research_report", this.researchReportNode)
-      .addNode("generate_ideas", this.generateIdeasNode);
+      .addNode("research_plan", (state: AgentState, config: LangGraphRunnableConfig) =>
+        MarketingCopyAgent.agentFrom(config).researchPlanNode(state))
+      .addNode("trend_retrieval", (state: AgentState, config: LangGraphRunnableConfig) =>
+        MarketingCopyAgent.agentFrom(config).trendRetrievalNode(state))
+      .addNode("research_report", (state: AgentState, config: LangGraphRunnableConfig) =>
+        MarketingCopyAgent.agentFrom(config).researchReportNode(state, config))
+      .addNode("generate_ideas", (state: AgentState, config: LangGraphRunnableConfig) =>
+        MarketingCopyAgent.agentFrom(config).generateIdeasNode(state, config));
 
     // Add edges - deep mode goes straight to research_plan
     graph.addEdge(START, "research_plan");
@@ -771,7 +1343,7 @@ class MarketingCopyAgent {
     graph.addEdge("trend_retrieval", "research_report");
     graph.addConditionalEdges(
       "research_report",
-      this.checkApproval,
+      MarketingCopyAgent.checkApproval,
       {
         end: END,
         generate_ideas: "generate_ideas"
@@ -783,15 +1355,16 @@ class MarketingCopyAgent {
   }
 
   // Build Fast Mode Graph
-  private buildFastModeGraph(): any {
+  private static buildFastModeGraph(): any {
     const graph = new StateGraph(AgentStateAnnotation)
-      .addNode("fast_mode", this.fastModeNode);
+      .addNode("fast_mode", (state: AgentState, config: LangGraphRunnableConfig) =>
+        MarketingCopyAgent.agentFrom(config).fastModeNode(state));
 
     // Add edges - fast mode goes straight to fast_mode
     graph.addEdge(START, "fast_mode");
     graph.addConditionalEdges(
       "fast_mode",
-      this.checkApproval,
+      MarketingCopyAgent.checkApproval,
       {
         end: END,
         generate_ideas: END // Fast mode doesn't generate ideas in the graph
@@ -801,6 +1374,18 @@ class MarketingCopyAgent {
     return graph.compile();
   }
 
+  // Build Idea Graph (used after research approval)
+  private static buildIdeaGraph(): any {
+    const graph = new StateGraph(AgentStateAnnotation)
+      .addNode("generate_ideas", (state: AgentState, config: LangGraphRunnableConfig) =>
+        MarketingCopyAgent.agentFrom(config).generateIdeasNode(state, config));
+
+    graph.addEdge(START, "generate_ideas");
+    graph.addEdge("generate_ideas", END);
+
+    return graph.compile();
+  }
+
   // Transform LangGraph state updates to streaming events
   private *transformGraphEvents(state: AgentState): Generator<any, void, unknown> {
     // Yield all accumulated stream events
@@ -814,11 +1399,12 @@ class MarketingCopyAgent {
     platforms: string[],
     sessionId: string,
     mode: string = "fast",
-    persona?: "author" | "founder"
+    persona?: "author" | "founder",
+    isRefinement: boolean = false
   ): AsyncGenerator<any, void, unknown> {
     // Initialize graph if needed
-    if (!this.fastModeGraph) {
-      this.fastModeGraph = this.buildFastModeGraph();
+    if (!MarketingCopyAgent.fastModeGraph) {
+      MarketingCopyAgent.fastModeGraph = MarketingCopyAgent.buildFastModeGraph();
     }
 
     // Initial state
@@ -828,7 +1414,7 @@ class MarketingCopyAgent {
       persona,
       sessionId,
       mode: "fast",
-      isRefinement: false,
+      isRefinement,
       research: "",
       sources: [],
       trendingTopics: [],
@@ -847,8 +1433,8 @@ class MarketingCopyAgent {
 
     // Use stream() instead of invoke() to get incremental state updates
     let lastEventCount = 0;
-    const stream = await this.fastModeGraph.stream(initialState, {
-      configurable: { thread_id: sessionId }
+    const stream = await MarketingCopyAgent.fastModeGraph.stream(initialState, {
+      configurable: { thread_id: sessionId, agent: this }
     });
     
     for await (const chunk of stream) {
@@ -879,13 +1465,13 @@ class MarketingCopyAgent {
     persona?: "author" | "founder"
   ): AsyncGenerator<any, void, unknown> {
     if (mode === "fast") {
-      yield* this.runFastMode(query, platforms, sessionId, mode, persona);
+      yield* this.runFastMode(query, platforms, sessionId, mode, persona, isRefinement);
       return;
     }
 
     // Deep mode: use LangGraph to orchestrate the workflow
-    if (!this.deepModeGraph) {
-      this.deepModeGraph = this.buildDeepModeGraph();
+    if (!MarketingCopyAgent.deepModeGraph) {
+      MarketingCopyAgent.deepModeGraph = MarketingCopyAgent.buildDeepModeGraph();
     }
     
     // Initial state
@@ -913,13 +1499,20 @@ class MarketingCopyAgent {
     };
 
     // Use stream() instead of invoke() to get incremental state updates
-    // This allows us to yield events as they happen, not just at the end
+    // This allows us to yield events as they happen, not just at the end.
+    // "custom" mode carries events written mid-node (e.g. partial report drafts)
     let lastEventCount = 0;
-    const stream = await this.deepModeGraph.stream(initialState, {
-      configurable: { thread_id: sessionId }
+    const stream = await MarketingCopyAgent.deepModeGraph.stream(initialState, {
+      configurable: { thread_id: sessionId, agent: this },
+      streamMode: ["updates", "custom"]
     });
     
-    for await (const chunk of stream) {
+    for await (const [streamMode, chunk] of stream) {
+      if (streamMode === "custom") {
+        yield chunk;
+        continue;
+      }
+
       // LangGraph stream returns chunks with node names as keys
       // Extract the state from the chunk
       const stateUpdate = Object.values(chunk)[0] as AgentState;
@@ -943,16 +1536,12 @@ class MarketingCopyAgent {
     research: string,
     platforms: string[],
     persona?: "author" | "founder",
-    ctx?: any
+    isRefinement: boolean = false
   ): AsyncGenerator<any, void, unknown> {
-    // Build a simple graph for idea generation after approval
-    const ideaGraph = new StateGraph(AgentStateAnnotation)
-      .addNode("generate_ideas", this.generateIdeasNode);
-
-    ideaGraph.addEdge(START, "generate_ideas");
-    ideaGraph.addEdge("generate_ideas", END);
-
-    const compiledGraph = ideaGraph.compile();
+    // Initialize graph if needed
+    if (!MarketingCopyAgent.ideaGraph) {
+      MarketingCopyAgent.ideaGraph = MarketingCopyAgent.buildIdeaGraph();
+    }
 
     // Initial state with approved research
     const initialState: AgentState = {
@@ -961,7 +1550,7 @@ class MarketingCopyAgent {
       persona,
       sessionId,
       mode: "deep",
-      isRefinement: false,
+      isRefinement,
       research,
       researchReport: research,
       sources: [],
@@ -979,12 +1568,19 @@ class MarketingCopyAgent {
     };
 
     // Use stream() instead of invoke() to get incremental state updates
+    // "custom" mode carries per-platform idea events as each platform finishes
     let lastEventCount = 0;
-    const stream = await compiledGraph.stream(initialState, {
-      configurable: { thread_id: sessionId }
+    const stream = await MarketingCopyAgent.ideaGraph.stream(initialState, {
+      configurable: { thread_id: sessionId, agent: this },
+      streamMode: ["updates", "custom"]
     });
     
-    for await (const chunk of stream) {
+    for await (const [streamMode, chunk] of stream) {
+      if (streamMode === "custom") {
+        yield chunk;
+        continue;
+      }
+
       // LangGraph stream returns chunks with node names as keys
       // Extract the state from the chunk
       const stateUpdate = Object.values(chunk)[0] as AgentState;
@@ -1022,34 +1618,34 @@ export const generateIdeas = action({
       persona: args.persona,
     });
 
-    const agent = new MarketingCopyAgent();
-    let lastResearchComplete: any = null;
+    const agent = new MarketingCopyAgent(ctx);
+    // research_complete and approval_required carry the same payload; store it once
+    let approvalStored = false;
 
-    // Process all events and update Convex state
-    for await (const event of agent.runStream(args.query, args.platforms, args.sessionId, false, args.mode || "deep", args.persona)) {
-      // Update Convex state as events come in
-      await ctx.runMutation(api.streamHandler.handleStreamEvent, {
+    // Process all events and update Convex state, one mutation per batch of events
+    const events = agent.runStream(args.query, args.platforms, args.sessionId, false, args.mode || "deep", args.persona);
+    for await (const batch of batchStreamEvents(events, STREAM_CONFIG.batchWindowMs, STREAM_CONFIG.maxBatchSize)) {
+      await ctx.runMutation(api.streamHandler.handleStreamEvents, {
         sessionId: args.sessionId,
-        event,
+        events: batch,
       });
 
-      // Store pending approval when research completes
-      if (event.type === "research_complete" || event.type === "approval_required") {
-        lastResearchComplete = event;
-        await ctx.runMutation(api.sessions.storePendingApproval, {
-          sessionId: args.sessionId,
-          research: event.research || event.research_report,
-          researchReport: event.research_report || event.research,
-          sources: event.sources,
-          trendingTopics: event.trending_topics,
-          enrichedTrends: event.enriched_trends,
-          confidenceScores: event.confidence_scores,
-          scope: { ...DEFAULT_SCOPE },
-          platforms: args.platforms,
-          originalQuery: args.query,
-          persona: args.persona,
-          mode: args.mode || "deep",
-        });
+      for (const event of batch) {
+        // Store pending approval when research completes
+        if (!approvalStored && (event.type === "research_complete" || event.type === "approval_required")) {
+          approvalStored = true;
+          await ctx.runMutation(api.sessions.storePendingApproval, {
+            sessionId: args.sessionId,
+            research: event.research || event.research_report,
+            sources: event.sources,
+            trendingTopics: event.trending_topics,
+            scope: { ...DEFAULT_SCOPE },
+            platforms: args.platforms,
+            originalQuery: args.query,
+            persona: args.persona,
+            mode: args.mode || "deep",
+          });
+        }
       }
     }
 
@@ -1064,14 +1660,17 @@ export const approveResearch = action({
     refinement: v.optional(v.string()),
   },
   handler: async (ctx, args) => {
-    const agent = new MarketingCopyAgent();
+    const agent = new MarketingCopyAgent(ctx);
     
     // Get approval data from database
     const approvalData = await ctx.runQuery(api.sessions.getPendingApproval, {
       sessionId: args.sessionId,
     });
 
-    if (!approvalData) {
+    // Checked here rather than in the query, since Convex caches query results until the
+    // rows they read change; approvals past the retention window count as gone even
+    // before the purge job removes them
+    if (!approvalData || approvalData.createdAt < Date.now() - RETENTION_CONFIG.pendingApprovalTtlMs) {
       throw new Error(`Session ${args.sessionId} not found`);
     }
 
@@ -1082,16 +1681,47 @@ export const approveResearch = action({
         approved: true,
       });
 
-      for await (const event of agent.continueAfterApproval(
+      const research = approvalData.research || approvalData.researchReport || "";
+      const ideasKey = ideasCacheKey(research, approvalData.platforms, approvalData.persona);
+
+      // Same research and platforms as last time: replay the stored ideas without calling the LLM
+      if (approvalData.ideasCache?.key === ideasKey) {
+        const cachedIdeas: Record<string, string[]> = approvalData.ideasCache.ideas;
+        await ctx.runMutation(api.streamHandler.handleStreamEvents, {
+          sessionId: args.sessionId,
+          events: [
+            ...approvalData.platforms.map((platform) => ({
+              type: "idea_stream",
+              platform,
+              ideas: cachedIdeas[platform] || [],
+            })),
+            { type: "complete", ideas: cachedIdeas },
+          ],
+        });
+        return { success: true };
+      }
+
+      const events = agent.continueAfterApproval(
         args.sessionId,
-        approvalData.research || approvalData.researchReport || "",
+        research,
         approvalData.platforms,
-        approvalData.persona
-      )) {
-        await ctx.runMutation(api.streamHandler.handleStreamEvent, {
+        approvalData.persona,
+        approvalData.isRefinement || false
+      );
+      for await (const batch of batchStreamEvents(events, STREAM_CONFIG.batchWindowMs, STREAM_CONFIG.maxBatchSize)) {
+        await ctx.runMutation(api.streamHandler.handleStreamEvents, {
           sessionId: args.sessionId,
-          event,
+          events: batch,
         });
+
+        const completeEvent = batch.find((event) => event.type === "complete");
+        if (completeEvent) {
+          await ctx.runMutation(internal.sessions.cacheApprovalIdeas, {
+            sessionId: args.sessionId,
+            key: ideasKey,
+            ideas: completeEvent.ideas,
+          });
+        }
       }
 
       return { success: true };
@@ -1105,36 +1735,39 @@ export const approveResearch = action({
         : (args.refinement || approvalData.originalQuery);
 
       const mode = approvalData.mode || "deep";
+      let approvalStored = false;
 
-      for await (const event of agent.runStream(
+      const events = agent.runStream(
         newQuery,
         approvalData.platforms,
         args.sessionId,
         true,
         mode,
         approvalData.persona
-      )) {
-        await ctx.runMutation(api.streamHandler.handleStreamEvent, {
+      );
+      for await (const batch of batchStreamEvents(events, STREAM_CONFIG.batchWindowMs, STREAM_CONFIG.maxBatchSize)) {
+        await ctx.runMutation(api.streamHandler.handleStreamEvents, {
           sessionId: args.sessionId,
-          event,
+          events: batch,
         });
 
-        // Store pending approval when research completes
-        if (event.type === "research_complete" || event.type === "approval_required") {
-          await ctx.runMutation(api.sessions.storePendingApproval, {
-            sessionId: args.sessionId,
-            research: event.research || event.research_report,
-            researchReport: event.research_report || event.research,
-            sources: event.sources,
-            trendingTopics: event.trending_topics,
-            enrichedTrends: event.enriched_trends,
-            confidenceScores: event.confidence_scores,
-            scope: approvalData.scope || { ...DEFAULT_SCOPE },
-            platforms: approvalData.platforms,
-            originalQuery: newQuery,
-            persona: approvalData.persona,
-            mode: mode,
-          });
+        for (const event of batch) {
+          // Store pending approval when research completes
+          if (!approvalStored && (event.type === "research_complete" || event.type === "approval_required")) {
+            approvalStored = true;
+            await ctx.runMutation(api.sessions.storePendingApproval, {
+              sessionId: args.sessionId,
+              research: event.research || event.research_report,
+              sources: event.sources,
+              trendingTopics: event.trending_topics,
+              scope: approvalData.scope || { ...DEFAULT_SCOPE },
+              platforms: approvalData.platforms,
+              originalQuery: newQuery,
+              persona: approvalData.persona,
+              mode: mode,
+              isRefinement: true,
+            });
+          }
         }
       }
 
@@ -2,6 +2,29 @@
 export const LLM_CONFIG = {
   modelName: "gpt-4o-mini",
   temperature: 0.7,
+  maxConcurrentCalls: 8,
+} as const;
+
+// LLM Response Cache Configuration
+export const CACHE_CONFIG = {
+  maxMemoryEntries: 500,
+  scopeTtlMs: 24 * 60 * 60 * 1000,
+  enrichmentTtlMs: 60 * 60 * 1000,
+  candidateEnrichmentTtlMs: 24 * 60 * 60 * 1000,
+  fastResearchTtlMs: 60 * 60 * 1000,
+  ideasTtlMs: 60 * 60 * 1000,
+} as const;
+
+// Retention for stored approvals and cached responses (purged by crons.ts)
+export const RETENTION_CONFIG = {
+  pendingApprovalTtlMs: 24 * 60 * 60 * 1000,
+  purgeBatchSize: 100,
+} as const;
+
+// Coalescing of agent events into handleStreamEvents mutations
+export const STREAM_CONFIG = {
+  batchWindowMs: 30,
+  maxBatchSize: 16,
 } as const;
 
 // Tavily API Configuration
@@ -9,6 +32,7 @@ export const TAVILY_CONFIG = {
   apiEndpoint: "https://api.tavily.com/search",
   searchDepth: "advanced",
   maxResults: 10,
+  timeoutMs: 30000,
 } as const;
 
 // Persona Definitions
@@ -91,6 +115,20 @@ export const TREND_SOURCES_CONFIG: Record<string, string[]> = {
   ]
 };
 
+// Reddit Sources Configuration - Subreddits ranked by relevance per research domain
+export const REDDIT_SOURCES_CONFIG: Record<string, string[]> = {
+  technology: ["technology", "programming", "startups"],
+  marketing: ["marketing", "socialmedia", "digital_marketing"],
+  finance: ["personalfinance", "investing", "fintech"],
+  "consumer goods": ["business", "ecommerce", "entrepreneur"],
+  general: ["technology", "marketing", "entrepreneur", "startups", "business"],
+};
+
+// Platform name aliases (keys are lowercased user input)
+export const PLATFORM_ALIASES: Record<string, string> = {
+  twitter: "x",
+};
+
 // Default Scope Configuration
 export const DEFAULT_SCOPE = {
   time_window: "last 30 days",
@@ -108,6 +146,9 @@ export const THRESHOLDS = {
   minIdeaLength: 10,
   fallbackTrendCount: 5,
   fallbackTextLength: 200,
+  reportStreamFlushChars: 400,
+  enrichmentContentTokens: 128,
+  maxSubredditsPerSearch: 3,
 } as const;
 
 // System Messages
@@ -137,6 +178,13 @@ export const SYSTEM_MESSAGES = {
     return `You are a ${platform} marketing copy expert.`;
   },
   
+  multiPlatformCopyExpert: (persona?: string, personaDescription?: string) => {
+    if (persona && personaDescription) {
+      return `You are a multi-platform marketing copy expert specialized in creating content for ${persona}s. ${personaDescription}`;
+    }
+    return "You are a multi-platform marketing copy expert.";
+  },
+  
   marketingResearcher: (persona?: string, personaDescription?: string) => {
     if (persona && personaDescription) {
       return `You are an expert marketing researcher specialized in creating reports for ${persona}s. ${personaDescription} Generate comprehensive, actionable research reports with structured data that align with this persona's goals.`;
@@ -166,12 +214,30 @@ export const PROMPTS = {
     3. Key supporting evidence points
     
     Trend: ${candidate.title || ""}
-    Content: ${(candidate.content || "").substring(0, 500)}
+    Content: ${truncateToTokenBudget(candidate.content || "", THRESHOLDS.enrichmentContentTokens)}
     Source: ${candidate.source || ""}
     
     Return JSON with: summary, why_it_matters, key_evidence
   `,
   
+  batchTrendEnrichment: (candidates: Array<{ title?: string; content?: string; source?: string }>) => `
+    Analyze each of these trend candidates and provide for every one:
+    1. A 1-2 sentence summary
+    2. Why this trend matters for marketing
+    3. Key supporting evidence points
+    
+    Trends:
+    ${JSON.stringify(candidates.map((candidate, i) => ({
+      i,
+      title: candidate.title || "",
+      content: truncateToTokenBudget(candidate.content || "", THRESHOLDS.enrichmentContentTokens),
+      source: candidate.source || ""
+    })))}
+    
+    Return a JSON object with key "enrichments": an array with one entry per trend,
+    each with: i (the trend's index), summary, why_it_matters, key_evidence
+  `,
+  
   researchReport: (
     query: string,
     scope: { time_window: string; region: string; domain: string },
@@ -183,7 +249,7 @@ export const PROMPTS = {
     Scope: ${JSON.stringify(scope)}${persona ? `\n\nPersona Context:\n${PERSONA_DESCRIPTIONS[persona] || ""}\n\nWhen analyzing trends, prioritize those that align with this persona's goals and audience.` : ""}
     
     Trends to include (top ${topTrends.length}):
-    ${JSON.stringify(topTrends, null, 2)}
+    ${JSON.stringify(topTrends)}
     
     Format the report as:
     # Research Report: ${query}
@@ -245,6 +311,26 @@ export const PROMPTS = {
     `;
   },
   
+  multiPlatformCopyGeneration: (
+    research: string,
+    platforms: string[],
+    persona?: string
+  ) => {
+    const personaContext = persona && PERSONA_DESCRIPTIONS[persona]
+      ? `\n\n${PERSONA_DESCRIPTIONS[persona]}\n\nGenerate copy that authentically reflects this persona's voice, goals, and target audience.`
+      : "";
+    
+    return `
+      Based on this research:
+      ${research}
+      
+      Generate 5 creative marketing copy ideas for each of these platforms: ${platforms.join(", ")}.
+      Make each idea appropriate for its platform (character limits, tone, format).${personaContext}
+      Return a JSON object with one key per platform, spelled exactly as listed above,
+      each mapping to a JSON array of strings.
+    `;
+  },
+  
   fastModeResearch: (
     query: string,
     platforms: string[],
@@ -335,3 +421,32 @@ export const getPersonaCopyContext = (persona?: string): string => {
   }
   return "";
 };
+
+// Helper function to cut text to an approximate token budget
+// (word runs count ~4 chars per token, each punctuation mark as one token)
+export const truncateToTokenBudget = (text: string, maxTokens: number): string => {
+  const tokenPattern = /[A-Za-z0-9]+|[^A-Za-z0-9\s]/g;
+  let tokenCount = 0;
+  let match: RegExpExecArray | null;
+  while ((match = tokenPattern.exec(text)) !== null) {
+    tokenCount += /[A-Za-z0-9]/.test(match[0][0]) ? Math.ceil(match[0].length / 4) : 1;
+    if (tokenCount > maxTokens) {
+      return text.substring(0, match.index).trimEnd();
+    }
+  }
+  return text;
+};
+
+// Helper function to peel a surrounding markdown code fence (``` or ```json) off LLM output
+export const stripCodeFence = (text: string): string => {
+  let stripped = text.trim();
+  if (stripped.slice(0, 7).toLowerCase() === "```json") {
+    stripped = stripped.slice(7);
+  } else if (stripped.startsWith("```")) {
+    stripped = stripped.slice(3);
+  }
+  if (stripped.endsWith("```")) {
+    stripped = stripped.slice(0, -3);
+  }
+  return stripped.trim();
+};
@@ -0,0 +1,10 @@
+import { cronJobs } from "convex/server";
+import { internal } from "./_generated/api";
+
+const crons = cronJobs();
+
+// Expire stale approvals and LLM cache entries so the tables don't grow unbounded
+crons.interval("purge expired pending approvals", { hours: 1 }, internal.sessions.purgeExpiredPendingApprovals);
+crons.interval("purge expired llm cache entries", { hours: 1 }, internal.llmCache.purgeExpiredResponses);
+
+export default crons;
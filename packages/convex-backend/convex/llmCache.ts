@@ -0,0 +1,72 @@
+import { internalMutation, internalQuery } from "./_generated/server";
+import { v } from "convex/values";
+import { internal } from "./_generated/api";
+import { RETENTION_CONFIG } from "./config";
+
+// Persistent LLM response cache, keyed by a hash of the model and prompt messages.
+// Lookups and writes take several keys at once so callers pay one round trip.
+// Lookups return expiresAt and leave the expiry check to the caller, since query
+// results are cached until the rows change rather than as time passes
+export const getCachedResponses = internalQuery({
+  args: { keys: v.array(v.string()) },
+  handler: async (ctx, args) => {
+    return await Promise.all(args.keys.map(async (key) => {
+      const entry = await ctx.db
+        .query("llmCache")
+        .withIndex("by_key", (q) => q.eq("key", key))
+        .first();
+      return entry ? { response: entry.response, expiresAt: entry.expiresAt } : null;
+    }));
+  },
+});
+
+export const storeCachedResponses = internalMutation({
+  args: {
+    entries: v.array(v.object({
+      key: v.string(),
+      response: v.string(),
+    })),
+    ttlMs: v.number(),
+  },
+  handler: async (ctx, args) => {
+    const now = Date.now();
+    for (const entry of args.entries) {
+      const existing = await ctx.db
+        .query("llmCache")
+        .withIndex("by_key", (q) => q.eq("key", entry.key))
+        .first();
+
+      const data = {
+        key: entry.key,
+        response: entry.response,
+        expiresAt: now + args.ttlMs,
+        createdAt: now,
+      };
+
+      if (existing) {
+        await ctx.db.patch(existing._id, data);
+      } else {
+        await ctx.db.insert("llmCache", data);
+      }
+    }
+  },
+});
+
+// Delete expired cache entries, in batches
+export const purgeExpiredResponses = internalMutation({
+  handler: async (ctx): Promise<void> => {
+    const expired = await ctx.db
+      .query("llmCache")
+      .withIndex("by_expires", (q) => q.lt("expiresAt", Date.now()))
+      .take(RETENTION_CONFIG.purgeBatchSize);
+
+    for (const entry of expired) {
+      await ctx.db.delete(entry._id);
+    }
+
+    // Keep going in a new transaction if there may be more to delete
+    if (expired.length === RETENTION_CONFIG.purgeBatchSize) {
+      await ctx.scheduler.runAfter(0, internal.llmCache.purgeExpiredResponses);
+    }
+  },
+});
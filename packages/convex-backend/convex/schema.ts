@@ -8,6 +8,7 @@ export default defineSchema({
     platforms: v.array(v.string()),
     persona: v.optional(v.union(v.literal("author"), v.literal("founder"))),
     research: v.optional(v.string()),
+    reportDraft: v.optional(v.string()),
     sources: v.optional(v.array(v.string())),
     trendingTopics: v.optional(v.array(v.object({
       topic: v.string(),
@@ -47,7 +48,7 @@ export default defineSchema({
   pendingApprovals: defineTable({
     sessionId: v.string(),
     research: v.optional(v.string()),
-    researchReport: v.optional(v.string()),
+    researchReport: v.optional(v.string()), // Legacy: no longer written, the report is stored once in research
     sources: v.optional(v.array(v.string())),
     trendingTopics: v.optional(v.array(v.object({
       topic: v.string(),
@@ -56,8 +57,8 @@ export default defineSchema({
       timestamp: v.optional(v.string()),
       confidence: v.optional(v.string()),
     }))),
-    enrichedTrends: v.optional(v.any()),
-    confidenceScores: v.optional(v.any()),
+    enrichedTrends: v.optional(v.any()), // Legacy: no longer written
+    confidenceScores: v.optional(v.any()), // Legacy: no longer written
     scope: v.optional(v.any()),
     platforms: v.array(v.string()),
     originalQuery: v.string(),
@@ -65,6 +66,18 @@ export default defineSchema({
     mode: v.optional(v.string()),
     approved: v.optional(v.boolean()),
     needsRefinement: v.optional(v.boolean()),
+    isRefinement: v.optional(v.boolean()), // Research came from a restart/refine; ideas skip the LLM cache
+    ideasCache: v.optional(v.object({
+      key: v.string(),
+      ideas: v.any(),
+    })),
     createdAt: v.number(),
-  }).index("by_session", ["sessionId"]),
+  }).index("by_session", ["sessionId"]).index("by_created", ["createdAt"]),
+
+  llmCache: defineTable({
+    key: v.string(),
+    response: v.string(),
+    expiresAt: v.number(),
+    createdAt: v.number(),
+  }).index("by_key", ["key"]).index("by_expires", ["expiresAt"]),
 });
@@ -1,5 +1,7 @@
-import { mutation, query } from "./_generated/server";
+import { internalMutation, mutation, query } from "./_generated/server";
 import { v } from "convex/values";
+import { internal } from "./_generated/api";
+import { RETENTION_CONFIG } from "./config";
 
 export const createSession = mutation({
   args: {
@@ -25,6 +27,7 @@ export const createSession = mutation({
         persona: args.persona,
         status: "researching",
         research: undefined,
+        reportDraft: undefined,
         sources: undefined,
         trendingTopics: undefined,
         ideas: undefined,
@@ -162,6 +165,7 @@ export const resetSession = mutation({
     await ctx.db.patch(session._id, {
       query: args.query || session.query,
       research: undefined,
+      reportDraft: undefined,
       sources: undefined,
       trendingTopics: undefined,
       ideas: undefined,
@@ -176,7 +180,6 @@ export const storePendingApproval = mutation({
   args: {
     sessionId: v.string(),
     research: v.optional(v.string()),
-    researchReport: v.optional(v.string()),
     sources: v.optional(v.array(v.string())),
     trendingTopics: v.optional(v.array(v.object({
       topic: v.string(),
@@ -185,13 +188,12 @@ export const storePendingApproval = mutation({
       timestamp: v.optional(v.string()),
       confidence: v.optional(v.string()),
     }))),
-    enrichedTrends: v.optional(v.any()),
-    confidenceScores: v.optional(v.any()),
     scope: v.optional(v.any()),
     platforms: v.array(v.string()),
     originalQuery: v.string(),
     persona: v.optional(v.union(v.literal("author"), v.literal("founder"))),
     mode: v.optional(v.string()),
+    isRefinement: v.optional(v.boolean()),
   },
   handler: async (ctx, args) => {
     const existing = await ctx.db
@@ -202,23 +204,22 @@ export const storePendingApproval = mutation({
     const data = {
       sessionId: args.sessionId,
       research: args.research,
-      researchReport: args.researchReport,
       sources: args.sources,
       trendingTopics: args.trendingTopics,
-      enrichedTrends: args.enrichedTrends,
-      confidenceScores: args.confidenceScores,
       scope: args.scope,
       platforms: args.platforms,
       originalQuery: args.originalQuery,
       persona: args.persona,
       mode: args.mode,
+      isRefinement: args.isRefinement,
       approved: false,
       needsRefinement: false,
       createdAt: Date.now(),
     };
 
+    // Replace rather than patch so fields from older rows don't linger
     if (existing) {
-      await ctx.db.patch(existing._id, data);
+      await ctx.db.replace(existing._id, data);
     } else {
       await ctx.db.insert("pendingApprovals", data);
     }
@@ -257,3 +258,45 @@ export const updatePendingApproval = mutation({
     });
   },
 });
+
+// Remember the ideas generated for an approval so approving the same research again
+// can replay them. Storing new research replaces the row, which drops this cache
+export const cacheApprovalIdeas = internalMutation({
+  args: {
+    sessionId: v.string(),
+    key: v.string(),
+    ideas: v.any(),
+  },
+  handler: async (ctx, args) => {
+    const existing = await ctx.db
+      .query("pendingApprovals")
+      .withIndex("by_session", (q) => q.eq("sessionId", args.sessionId))
+      .first();
+
+    if (existing) {
+      await ctx.db.patch(existing._id, {
+        ideasCache: { key: args.key, ideas: args.ideas },
+      });
+    }
+  },
+});
+
+// Delete pending approvals older than the retention window, in batches
+export const purgeExpiredPendingApprovals = internalMutation({
+  handler: async (ctx): Promise<void> => {
+    const cutoff = Date.now() - RETENTION_CONFIG.pendingApprovalTtlMs;
+    const expired = await ctx.db
+      .query("pendingApprovals")
+      .withIndex("by_created", (q) => q.lt("createdAt", cutoff))
+      .take(RETENTION_CONFIG.purgeBatchSize);
+
+    for (const approval of expired) {
+      await ctx.db.delete(approval._id);
+    }
+
+    // Keep going in a new transaction if there may be more to delete
+    if (expired.length === RETENTION_CONFIG.purgeBatchSize) {
+      await ctx.scheduler.runAfter(0, internal.sessions.purgeExpiredPendingApprovals);
+    }
+  },
+});
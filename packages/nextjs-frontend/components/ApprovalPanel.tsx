@@ -7,6 +7,7 @@ import ReactMarkdown from 'react-markdown'
 
 interface ApprovalPanelProps {
   research: string | undefined
+  reportDraft?: string
   sources: string[] | undefined
   trendingTopics: Array<{ 
     topic: string; 
@@ -24,6 +25,7 @@ interface ApprovalPanelProps {
 
 export function ApprovalPanel({
   research,
+  reportDraft,
   sources,
   trendingTopics,
   sessionStatus,
@@ -36,10 +38,8 @@ export function ApprovalPanel({
   const [refinementText, setRefinementText] = useState('')
   const refinementInputRef = useRef<HTMLDivElement>(null)
 
-  // Debug: log when refinement mode changes
+  // Scroll to refinement input when it appears
   useEffect(() => {
-    console.log('ApprovalPanel: refinementMode changed to:', refinementMode)
-    // Scroll to refinement input when it appears
     if (refinementMode !== 'none' && refinementInputRef.current) {
       setTimeout(() => {
         refinementInputRef.current?.scrollIntoView({ behavior: 'smooth', block: 'nearest' })
@@ -56,7 +56,6 @@ export function ApprovalPanel({
   }
 
   const handleRestart = () => {
-    console.log('handleRestart called, refinementText:', refinementText)
     // For restart, pass the new query (or empty to use original)
     // The parent will handle clearing messages and resetting state
     onRestart(refinementText.trim() || '')
@@ -150,6 +149,18 @@ export function ApprovalPanel({
                     <p className="text-sm">Discovering trends...</p>
                   </div>
                 )}
+                {/* Report draft streamed while the final report is still being written */}
+                {reportDraft && (
+                  <div className="mt-4 p-4 bg-gray-50 rounded-lg border border-gray-200">
+                    <div className="flex items-center gap-2 mb-2">
+                      <FileText className="w-4 h-4 text-gray-600" />
+                      <h4 className="font-medium text-gray-900">Drafting Report</h4>
+                    </div>
+                    <div className="text-sm text-gray-700 prose prose-sm max-w-none">
+                      <ReactMarkdown>{reportDraft}</ReactMarkdown>
+                    </div>
+                  </div>
+                )}
               </div>
             ) : (
               /* When waiting_approval, generating, or complete: Show full research report */
@@ -332,12 +343,9 @@ export function ApprovalPanel({
               onClick={(e) => {
                 e.preventDefault()
                 e.stopPropagation()
-                console.log('Restart Research button clicked, isGenerating:', isGenerating)
                 if (!isGenerating) {
                   // Immediately restart without showing textarea
                   onRestart('')
-                } else {
-                  console.log('Button is disabled, cannot restart')
                 }
               }}
               disabled={isGenerating}
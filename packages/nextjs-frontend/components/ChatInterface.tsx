@@ -46,11 +46,6 @@ export function ChatInterface({ sessionId }: ChatInterfaceProps) {
     }
   }, [session?.persona])
 
-  // Debug: log messages when they change
-  useEffect(() => {
-    console.log('Messages updated:', messages?.length, messages)
-  }, [messages])
-
 
   const handleSubmit = async (e: React.FormEvent) => {
     e.preventDefault()
@@ -205,6 +200,7 @@ export function ChatInterface({ sessionId }: ChatInterfaceProps) {
         // Only update with session data if it exists
         setApprovalData({
           research: session.research,
+          reportDraft: session.reportDraft,
           sources: session.sources,
           trendingTopics: session.trendingTopics,
         })
@@ -18,6 +18,7 @@ interface MessageListProps {
   messages: Message[]
   approvalData?: {
     research?: string
+    reportDraft?: string
     sources?: string[]
     trendingTopics?: Array<{ topic: string; reason: string }>
   } | null
@@ -176,6 +177,7 @@ export function MessageList({ messages, approvalData, sessionStatus, isGeneratin
         <div className="max-w-2xl">
           <ApprovalPanel
             research={approvalData.research}
+            reportDraft={approvalData.reportDraft}
             sources={approvalData.sources}
             trendingTopics={approvalData.trendingTopics}
             sessionStatus={sessionStatus}
@@ -1,7 +1,7 @@
 'use client'
 
 import { useQuery } from 'convex/react'
-import { useEffect, useMemo } from 'react'
+import { useMemo } from 'react'
 // @ts-ignore - Import from backend package
 import { api } from '../../convex-backend/convex/_generated/api'
 import { PlatformIdeas } from './PlatformIdeas'
@@ -27,13 +27,6 @@ export function Sidebar({ sessionId }: SidebarProps) {
     }))
     return `${updatedAt}-${JSON.stringify(platformCounts)}`
   }, [ideas, updatedAt])
-  
-  // Debug: log when ideas or session changes
-  useEffect(() => {
-    console.log('Sidebar: Session updated, updatedAt:', updatedAt)
-    console.log('Sidebar: Current ideas:', Object.keys(ideas).map(p => `${p}: ${ideas[p]?.length || 0} ideas`))
-    console.log('Sidebar: Full ideas object:', ideas)
-  }, [ideas, updatedAt, session])
 
   const exportToMarkdown = () => {
     if (!session) return
@@ -171,11 +164,6 @@ export function Sidebar({ sessionId }: SidebarProps) {
               // Get ideas for this platform and clean them
               const platformIdeas = ideas[platform] || []
               
-              // Debug logging
-              if (platformIdeas.length > 0) {
-                console.log(`Sidebar: Platform ${platform} has ${platformIdeas.length} ideas:`, platformIdeas.slice(0, 2))
-              }
-              
               const cleanedIdeas = platformIdeas
                 .map((idea: any) => {
                   if (typeof idea !== 'string') return String(idea)